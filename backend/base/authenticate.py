@@ -1,4 +1,6 @@
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
 
 class CustomJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
@@ -10,7 +12,7 @@ class CustomJWTAuthentication(JWTAuthentication):
 
         try :
             user = self.get_user(validated_token)
-        except : 
+        except (InvalidToken, AuthenticationFailed): 
             return None    
         
         return (user, validated_token)
\ No newline at end of file
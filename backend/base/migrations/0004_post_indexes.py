@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-15 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0003_myuser_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='base_post_created_7bc835_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['user', '-created_at'], name='base_post_user_id_28585f_idx'),
+        ),
+    ]
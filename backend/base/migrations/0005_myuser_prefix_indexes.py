@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-15 12:00
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('base', '0004_post_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='myuser',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('username'), name='text_pattern_ops'), name='myuser_username_prefix'),
+        ),
+        migrations.AddIndex(
+            model_name='myuser',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('first_name'), name='text_pattern_ops'), name='myuser_first_name_prefix'),
+        ),
+        migrations.AddIndex(
+            model_name='myuser',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('last_name'), name='text_pattern_ops'), name='myuser_last_name_prefix'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
 # Create your models here.
 
 class MyUser(AbstractUser):
@@ -8,6 +10,20 @@ class MyUser(AbstractUser):
     profile_image = models.ImageField(upload_to='profile_images/', blank=True, null=True)
     followers = models.ManyToManyField('self', symmetrical=False, related_name='following', blank=True)
 
+    class Meta(AbstractUser.Meta):
+        # Trigram indexes for the icontains user search. Postgres compiles
+        # icontains to UPPER(column) LIKE UPPER(...), so the index is on UPPER().
+        indexes = [
+            GinIndex(OpClass(Upper('username'), name='gin_trgm_ops'), name='myuser_username_trgm'),
+            GinIndex(OpClass(Upper('first_name'), name='gin_trgm_ops'), name='myuser_first_name_trgm'),
+            GinIndex(OpClass(Upper('last_name'), name='gin_trgm_ops'), name='myuser_last_name_trgm'),
+            # B-tree prefix indexes for short istartswith queries
+            # (UPPER(column) LIKE UPPER('q%')).
+            models.Index(OpClass(Upper('username'), name='text_pattern_ops'), name='myuser_username_prefix'),
+            models.Index(OpClass(Upper('first_name'), name='text_pattern_ops'), name='myuser_first_name_prefix'),
+            models.Index(OpClass(Upper('last_name'), name='text_pattern_ops'), name='myuser_last_name_prefix'),
+        ]
+
     def __str__(self):
         return self.username
 
@@ -17,5 +33,13 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     likes = models.ManyToManyField(MyUser, related_name='post_likes', blank=True)
 
+    class Meta:
+        indexes = [
+            # Feed ordering (matches PostCursorPagination)
+            models.Index(fields=['-created_at', '-id']),
+            # A single user's posts, newest first
+            models.Index(fields=['user', '-created_at']),
+        ]
+
     def __str__(self):
         return f'Post by {self.user.username} at {self.created_at}'
\ No newline at end of file
@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import *
 
@@ -12,21 +13,20 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         fields = ['username', 'email', 'first_name', 'last_name', 'password']
 
     def create(self, validated_data):
-        user = MyUser(
-            username = validated_data['username'],
-            email = validated_data['email'],
-            first_name = validated_data['first_name'],
-            last_name= validated_data['last_name'],
-        )
-
-        user.set_password(validated_data['password'])
-        user.save()
-        return user
+        # create_user hashes the password and saves with a single INSERT
+        with transaction.atomic():
+            return MyUser.objects.create_user(
+                username = validated_data['username'],
+                email = validated_data['email'],
+                first_name = validated_data['first_name'],
+                last_name= validated_data['last_name'],
+                password = validated_data['password'],
+            )
 
 class MyUserSerializer(serializers.ModelSerializer):
 
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
+    followers_count = serializers.IntegerField(read_only=True)
+    following_count = serializers.IntegerField(read_only=True)
     can_message = serializers.SerializerMethodField()
 
 
@@ -34,12 +34,6 @@ class MyUserSerializer(serializers.ModelSerializer):
         model = MyUser
         fields = ['username', 'bio', 'profile_image', 'followers_count', 'following_count', 'can_message']
 
-    def get_followers_count(self, obj):
-        return obj.followers.count()
-    
-    def get_following_count(self, obj):
-        return obj.following.count()
-    
     def get_can_message(self, obj):
         """
         Check if the authenticated user can message this user.
@@ -55,28 +49,23 @@ class MyUserSerializer(serializers.ModelSerializer):
         if request.user == obj:
             return False
         
-        # Check mutual follow
-        from messaging.permissions import check_mutual_follow
-        return check_mutual_follow(request.user, obj)
+        # Check mutual follow (cached per request)
+        from messaging.permissions import cached_check_mutual_follow
+        return cached_check_mutual_follow(request, request.user, obj)
     
 class PostSerializer(serializers.ModelSerializer):
 
     username = serializers.SerializerMethodField()
-    like_count = serializers.SerializerMethodField()
-    formatted_date = serializers.SerializerMethodField()
+    like_count = serializers.IntegerField(read_only=True, default=0)
+    liked = serializers.BooleanField(read_only=True, default=False)
+    formatted_date = serializers.DateTimeField(source='created_at', format=None, read_only=True)
 
     class Meta:
         model = Post
-        fields = ['id', 'username', 'description', 'formatted_date', 'likes', 'like_count']
+        fields = ['id', 'username', 'description', 'formatted_date', 'like_count', 'liked']
 
     def get_username(self, obj):
         return obj.user.username
-    
-    def get_like_count(self, obj):
-        return obj.likes.count()
-    
-    def get_formatted_date(self, obj):
-        return obj.created_at.strftime(" %d %b %y")
 
 class UsersSerializer(serializers.ModelSerializer):
     class Meta:
@@ -1,18 +1,70 @@
+import logging
 from django.shortcuts import render
 from rest_framework.decorators import api_view , permission_classes
 from rest_framework.permissions import IsAuthenticated 
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import APIException
+from rest_framework.pagination import CursorPagination
+from django.contrib.auth.signals import user_logged_out
+from django.db import DatabaseError, transaction
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 
 from .models import MyUser, Post
 from .serializers import MyUserSerializer, PostSerializer, UserRegisterSerializer, UsersSerializer
+from messaging.permissions import invalidate_mutual_follow
 
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
 
+logger = logging.getLogger(__name__)
+
+class PostCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the feed: no COUNT(*) per page and no OFFSET scan,
+    so deep pages cost the same as the first one.
+    """
+    page_size = 10
+    ordering = ('-created_at', '-id')
+
+def annotate_posts(posts, user):
+    """
+    Attach like_count and liked (whether user liked the post) to each post
+    so the serializer doesn't need to run a query per post.
+    """
+    return posts.select_related('user').annotate(
+        like_count=Count('likes'),
+        liked=Exists(Post.likes.through.objects.filter(post_id=OuterRef('pk'), myuser_id=user.pk)),
+    )
+
+def toggle_through_row(through_model, **fields):
+    """
+    Delete the M2M through row matching fields, or create it if there was
+    none. Returns True if the row exists afterwards.
+
+    Deleting the row doubles as the membership check; the insert ignores
+    conflicts so concurrent double-clicks stay idempotent.
+    """
+    with transaction.atomic():
+        deleted, _ = through_model.objects.filter(**fields).delete()
+        if not deleted:
+            through_model.objects.bulk_create([through_model(**fields)], ignore_conflicts=True)
+    return not deleted
+
+def count_follows(field):
+    """
+    Number of follow rows whose <field> is the outer user, as a correlated
+    subquery. Joining both follow relations in one GROUP BY would count
+    over followers x following rows instead.
+    """
+    Follow = MyUser.followers.through
+    counts = Follow.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(c=Count('*'))
+    return Coalesce(Subquery(counts.values('c')), 0)
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def authenticated_view(request):
@@ -72,19 +124,19 @@ class CustomTokenObtainPairView(TokenObtainPairView):
                 }
             }
             return res
-        except:
+        except (APIException, KeyError, MyUser.DoesNotExist) as e:
+            logger.warning("Login failed: %s", e)
             return Response({ "success": False}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
 class CostumTokenRefreshView(TokenRefreshView):
     def post(self, request, *args, **kwargs):
         try :
-            refresh_token = request.COOKIES.get('refresh_token')
-            request.data['refresh'] = refresh_token
+            # The refresh token comes from the cookie; request.data may be an
+            # immutable QueryDict, so it is handed to the serializer directly
+            serializer = self.get_serializer(data={'refresh': request.COOKIES.get('refresh_token')})
+            serializer.is_valid(raise_exception=True)
 
-            response = super().post(request, *args, **kwargs)
-            tokens = response.data
-
-            access_token = tokens['access']
+            access_token = serializer.validated_data['access']
 
             res = Response()
             res.data = { "success": True}
@@ -98,7 +150,8 @@ class CostumTokenRefreshView(TokenRefreshView):
                 path = '/'
             ) 
             return res
-        except:
+        except (APIException, TokenError, KeyError) as e:
+            logger.warning("Token refresh failed: %s", e)
             return Response({ "success": False}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
                 
 
@@ -107,36 +160,39 @@ class CostumTokenRefreshView(TokenRefreshView):
 def get_user_profile_data (request,pk):
 
     try:
-        user =MyUser.objects.get(username=pk)
+        # One row in one query: the counts and the follow flag are each a
+        # subquery on the follow table, so nothing is joined or grouped
+        user = MyUser.objects.only('username', 'bio', 'profile_image').annotate(
+            followers_count=count_follows('from_myuser'),
+            following_count=count_follows('to_myuser'),
+            is_following=Exists(MyUser.followers.through.objects.filter(
+                from_myuser_id=OuterRef('pk'), to_myuser_id=request.user.pk
+            )),
+        ).get(username=pk)
     except MyUser.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-    
-    following = False
-
-    if request.user in user.followers.all():
-        following = True
 
     serializer = MyUserSerializer(user, many=False, context={'request': request})
-    return Response({**serializer.data, 'is_our_profile': user.username == request.user.username, 'following': following})
+    return Response({**serializer.data, 'is_our_profile': user.username == request.user.username, 'following': user.is_following})
     
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def toggle_follow(request):
     try:
         try:
-            my_user =MyUser.objects.get(username=request.user.username)
-            user_requesting = MyUser.objects.get(username=request.data["username"])
+            user_requesting = MyUser.objects.only('username').get(username=request.data["username"])
         except MyUser.DoesNotExist:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        if my_user in user_requesting.followers.all():
-            user_requesting.followers.remove(my_user)
-            return Response({'now_following': False})
-
-        else:
-            user_requesting.followers.add(my_user)
-            return Response({'now_following': True})
-    except:
+        now_following = toggle_through_row(
+            MyUser.followers.through,
+            from_myuser_id=user_requesting.pk, to_myuser_id=request.user.pk,
+        )
+
+        invalidate_mutual_follow(request.user, user_requesting)
+        return Response({'now_following': now_following})
+    except (KeyError, TypeError, DatabaseError):
+        logger.exception("Error toggling follow for %s", request.user.pk)
         return Response({'error': 'error following user'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)    
 
 @api_view(['GET'])
@@ -145,101 +201,80 @@ def get_user_posts(request, pk):
 
     try:
         user =MyUser.objects.get(username=pk)
-        requesting_user = MyUser.objects.get(username=request.user.username)
     except MyUser.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    posts = user.posts.all().order_by('-created_at')
+    posts = annotate_posts(user.posts.all(), request.user).order_by('-created_at')
     serializer = PostSerializer(posts, many=True)
-
-    data = []
-    
-    for post in serializer.data:
-        new_post ={}
-        liked = False
-
-        if requesting_user.username in post['likes']:
-            liked = True
-
-        new_post = { **post, 'liked': liked}
-        data.append(new_post)
-   
-    return Response(data)
+    return Response(serializer.data)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def toggle_like(request):
     try:    
         try:
-            post = Post.objects.get(id = request.data['id'])
+            post = Post.objects.only('id').get(id = request.data['id'])
         except Post.DoesNotExist:
             return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        try: 
-            user = MyUser.objects.get(username=request.user.username)
-        except MyUser.DoesNotExist:
-            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-        
-        if user in post.likes.all():
-            post.likes.remove(user)
-            return Response({'now_liked': False})
-        else:
-            post.likes.add(user)
-            return Response({'now_liked': True})
-    except:
+        now_liked = toggle_through_row(Post.likes.through, post_id=post.id, myuser_id=request.user.pk)
+
+        return Response({'now_liked': now_liked})
+    except (KeyError, TypeError, ValueError, DatabaseError):
+        logger.exception("Error toggling like for %s", request.user.pk)
         return Response({'error': 'error liking post'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_post(request):
     try:    
-        try:
-            user = MyUser.objects.get(username=request.user.username)
-        except MyUser.DoesNotExist:
-            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         post=Post.objects.create(
-            user=user,
+            user=request.user,
             description = request.data['description']
         )
-        serializer = PostSerializer(post, many=False)
-        return Response(serializer.data)
-    except:
+        # A new post has no likes yet, so build the PostSerializer shape
+        # directly instead of querying for them
+        return Response({
+            'id': post.id,
+            'username': request.user.username,
+            'description': post.description,
+            'formatted_date': post.created_at,
+            'like_count': 0,
+            'liked': False,
+        })
+    except (KeyError, DatabaseError):
+        logger.exception("Error creating post for %s", request.user.pk)
         return Response({'error': 'error creating post'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_all_posts(request):
-    try:
-        requesting_user = MyUser.objects.get(username=request.user.username)
-    except MyUser.DoesNotExist:
-        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-    
-    posts = Post.objects.all().order_by('-created_at')
+    posts = annotate_posts(Post.objects.all(), request.user)
 
-    paginator = PageNumberPagination()
-    paginator.page_size = 10
+    paginator = PostCursorPagination()
     result_page = paginator.paginate_queryset(posts, request)
 
     serializer = PostSerializer(result_page, many=True)
-    data=[]
-
-    for post in serializer.data:
-        new_post ={}
-        liked = False
-
-        if requesting_user.username in post['likes']:
-            liked = True
-
-        new_post = { **post, 'liked': liked}
-        data.append(new_post)
-    return paginator.get_paginated_response(data)
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def search_users(request):
-    query = request.query_params.get('query', '')
-    users = MyUser.objects.filter(username__icontains=query) | MyUser.objects.filter(first_name__icontains=query) | MyUser.objects.filter(last_name__icontains=query)
+    query = request.query_params.get('query', '').strip()
+    if not query:
+        return Response([])
+
+    users = MyUser.objects.only(*UsersSerializer.Meta.fields)
+    if len(query) < 3:
+        # Too short for trigrams; a prefix match can use the B-tree indexes
+        users = users.filter(
+            Q(username__istartswith=query) | Q(first_name__istartswith=query) | Q(last_name__istartswith=query)
+        )[:20]
+    else:
+        users = users.filter(
+            Q(username__icontains=query) | Q(first_name__icontains=query) | Q(last_name__icontains=query)
+        )[:50]
     serializer = UsersSerializer(users, many=True)
     return Response(serializer.data)
 
@@ -248,12 +283,7 @@ def search_users(request):
 @permission_classes([IsAuthenticated])
 def update_profile(request):
     data = request.data
-    try:
-        user = MyUser.objects.get(username=request.user.username)
-    except MyUser.DoesNotExist:
-        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-    
-    serializer= UsersSerializer(user,data, partial=True)
+    serializer= UsersSerializer(request.user,data, partial=True)
     if serializer.is_valid():
         serializer.save()
         return Response({**serializer.data, "success": True})
@@ -263,11 +293,12 @@ def update_profile(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout(request):
-    try:
-        res = Response()
-        res.delete_cookie('access_token', path='/', samesite="None")
-        res.delete_cookie('refresh_token', path='/', samesite="None")
-        res.data = { "success": True}
-        return res 
-    except:
-        return Response({ "success": False}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+    # The JWT cookies are dropped below rather than through auth.logout(),
+    # so notify user_logged_out listeners (e.g. the WebSocket user cache) here
+    user_logged_out.send(sender=request.user.__class__, request=request, user=request.user)
+
+    res = Response()
+    res.delete_cookie('access_token', path='/', samesite="None")
+    res.delete_cookie('refresh_token', path='/', samesite="None")
+    res.data = { "success": True}
+    return res
\ No newline at end of file
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'rest_framework_simplejwt',
@@ -127,6 +128,23 @@ CHANNEL_LAYERS = {
 #     },
 # }
 
+# Cache Configuration
+# Using local-memory cache for development
+# For production, use Redis so all workers share cached permission checks
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# Redis cache for production (uncomment when Redis is available)
+# CACHES = {
+#     "default": {
+#         "BACKEND": "django.core.cache.backends.redis.RedisCache",
+#         "LOCATION": f"redis://{os.getenv('REDIS_HOST', '127.0.0.1')}:{os.getenv('REDIS_PORT', 6379)}",
+#     },
+# }
+
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
@@ -4,11 +4,16 @@ WebSocket consumers for real-time messaging.
 This module contains the ChatConsumer class that handles WebSocket
 connections for real-time chat between users.
 """
-import json
 import logging
+import uuid
+from datetime import datetime, timezone
+import orjson
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db.models import Q
+from .models import Message
+from .permissions import MUTUAL_FOLLOW_TTL, mutual_follow_cache_key, mutual_follow_queryset
 
 logger = logging.getLogger(__name__)
 
@@ -67,12 +72,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
         logger.info(f"WebSocket connected - {self.user.username} joined {self.room_name}")
         
         # Notify room that user joined (optional)
-        await self.channel_layer.group_send(
-            self.room_group_name,
+        await self._broadcast(
+            'user_joined',
             {
                 'type': 'user_joined',
                 'username': self.user.username,
-            }
+            },
+            username=self.user.username,
         )
     
     async def disconnect(self, close_code):
@@ -83,12 +89,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """
         if hasattr(self, 'room_group_name'):
             # Notify room that user left
-            await self.channel_layer.group_send(
-                self.room_group_name,
+            username = getattr(self.user, 'username', 'Unknown')
+            await self._broadcast(
+                'user_left',
                 {
                     'type': 'user_left',
-                    'username': getattr(self.user, 'username', 'Unknown'),
-                }
+                    'username': username,
+                },
+                username=username,
             )
             
             # Leave room group
@@ -108,8 +116,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
         - mark_read: Mark messages as read
         """
         try:
-            data = json.loads(text_data)
-        except json.JSONDecodeError:
+            data = orjson.loads(text_data)
+        except ValueError:
             await self.send_error("Invalid JSON format")
             return
         
@@ -142,104 +150,128 @@ class ChatConsumer(AsyncWebsocketConsumer):
         # message = await self._save_message(content)
         
         # Broadcast message to room
-        await self.channel_layer.group_send(
-            self.room_group_name,
+        await self._broadcast(
+            'chat_message',
             {
                 'type': 'chat_message',
                 'content': content,
                 'sender': self.user.username,
                 'timestamp': self._get_timestamp(),
-                # 'message_id': str(message.id),  # Uncomment when model is ready
-            }
+                'message_id': None,  # str(message.id) once the model is ready
+            },
         )
     
     async def _handle_typing_start(self):
         """Broadcast typing indicator to room."""
-        await self.channel_layer.group_send(
-            self.room_group_name,
+        await self._broadcast(
+            'typing_indicator',
             {
-                'type': 'typing_indicator',
+                'type': 'typing',
                 'username': self.user.username,
                 'is_typing': True,
-            }
+            },
+            username=self.user.username,
         )
     
     async def _handle_typing_stop(self):
         """Broadcast typing stopped to room."""
-        await self.channel_layer.group_send(
-            self.room_group_name,
+        await self._broadcast(
+            'typing_indicator',
             {
-                'type': 'typing_indicator',
+                'type': 'typing',
                 'username': self.user.username,
                 'is_typing': False,
-            }
+            },
+            username=self.user.username,
         )
     
     async def _handle_mark_read(self, data):
         """Mark messages as read and notify sender."""
-        # Will be implemented when Message model is ready (Phase 10)
         message_ids = data.get('message_ids', [])
+        if not isinstance(message_ids, list):
+            message_ids = []
         
-        await self.channel_layer.group_send(
-            self.room_group_name,
+        valid_ids = []
+        for message_id in message_ids:
+            try:
+                valid_ids.append(uuid.UUID(str(message_id)))
+            except ValueError:
+                continue
+        
+        if valid_ids:
+            # One UPDATE, limited to this room's messages from the other user.
+            # Room names can repeat across pairs, so the conversation must
+            # also be one the reader takes part in.
+            await Message.amark_read(
+                Message.objects.filter(
+                    Q(conversation__participant_1=self.user) | Q(conversation__participant_2=self.user),
+                    pk__in=valid_ids,
+                    conversation__room_name=self.room_name,
+                ),
+                self.user,
+            )
+        
+        await self._broadcast(
+            'read_receipt',
             {
                 'type': 'read_receipt',
                 'reader': self.user.username,
                 'message_ids': message_ids,
-            }
+            },
+            reader=self.user.username,
         )
     
     # ==================== Event Handlers ====================
-    # These methods handle messages broadcast to the room group
+    # These methods handle messages broadcast to the room group.
+    # The payload is already encoded by _broadcast, so each recipient
+    # just forwards it.
     
     async def chat_message(self, event):
         """Send chat message to WebSocket."""
-        await self.send(text_data=json.dumps({
-            'type': 'chat_message',
-            'content': event['content'],
-            'sender': event['sender'],
-            'timestamp': event['timestamp'],
-            'message_id': event.get('message_id'),
-        }))
+        await self.send(text_data=event['payload'])
     
     async def typing_indicator(self, event):
         """Send typing indicator to WebSocket."""
         # Don't send typing indicator to the user who is typing
         if event['username'] != self.user.username:
-            await self.send(text_data=json.dumps({
-                'type': 'typing',
-                'username': event['username'],
-                'is_typing': event['is_typing'],
-            }))
+            await self.send(text_data=event['payload'])
     
     async def read_receipt(self, event):
         """Send read receipt to WebSocket."""
         # Only send to users who didn't trigger the read
         if event['reader'] != self.user.username:
-            await self.send(text_data=json.dumps({
-                'type': 'read_receipt',
-                'reader': event['reader'],
-                'message_ids': event['message_ids'],
-            }))
+            await self.send(text_data=event['payload'])
     
     async def user_joined(self, event):
         """Send user joined notification."""
         if event['username'] != self.user.username:
-            await self.send(text_data=json.dumps({
-                'type': 'user_joined',
-                'username': event['username'],
-            }))
+            await self.send(text_data=event['payload'])
     
     async def user_left(self, event):
         """Send user left notification."""
         if event['username'] != self.user.username:
-            await self.send(text_data=json.dumps({
-                'type': 'user_left',
-                'username': event['username'],
-            }))
+            await self.send(text_data=event['payload'])
     
     # ==================== Helper Methods ====================
     
+    async def _broadcast(self, handler, payload, **routing):
+        """
+        Encode payload once and send it to every consumer in the room.
+        
+        Args:
+            handler: Name of the event handler method recipients run
+            payload: Dict sent to the WebSocket clients
+            **routing: Extra event fields handlers use to filter recipients
+        """
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': handler,
+                'payload': orjson.dumps(payload).decode(),
+                **routing,
+            }
+        )
+    
     async def _can_join_room(self):
         """
         Check if user is allowed to join the room.
@@ -256,38 +288,40 @@ class ChatConsumer(AsyncWebsocketConsumer):
         # Get the other participant's username
         other_username = participants[0] if participants[1] == self.user.username else participants[1]
         
-        # Check mutual follow relationship
-        has_mutual_follow = await self._check_mutual_follow(other_username)
+        # Check mutual follow relationship, cached so reconnect storms
+        # don't repeat the same DB check
+        key = mutual_follow_cache_key(self.user.pk, other_username)
+        has_mutual_follow = await cache.aget(key)
+        if has_mutual_follow is None:
+            has_mutual_follow = await self._check_mutual_follow(other_username)
+            await cache.aset(key, has_mutual_follow, MUTUAL_FOLLOW_TTL)
         return has_mutual_follow
     
-    @database_sync_to_async
-    def _check_mutual_follow(self, other_username):
+    async def _check_mutual_follow(self, other_username):
         """
         Check if current user and other user have mutual follow.
         
+        Uses the async ORM directly instead of a thread hop. MyUser's
+        primary key is the username, so the other user doesn't need
+        to be fetched first; an unknown username simply doesn't match.
+        
         Args:
             other_username: Username of the other participant
             
         Returns:
             bool: True if mutual follow exists
         """
-        from .permissions import check_mutual_follow
-        from base.models import MyUser
-        
-        try:
-            other_user = MyUser.objects.get(username=other_username)
-            return check_mutual_follow(self.user, other_user)
-        except MyUser.DoesNotExist:
+        if other_username == self.user.username:
             return False
+        return await mutual_follow_queryset(self.user.pk, other_username).aexists()
     
     def _get_timestamp(self):
-        """Get current timestamp as ISO format string."""
-        from datetime import datetime
-        return datetime.utcnow().isoformat() + 'Z'
+        """Get current UTC timestamp as ISO format string."""
+        return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
     
     async def send_error(self, message):
         """Send error message to client."""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=orjson.dumps({
             'type': 'error',
             'message': message,
-        }))
+        }).decode())
@@ -5,42 +5,81 @@ This middleware extracts and validates JWT tokens from WebSocket connections,
 either from cookies or query parameters, and attaches the authenticated user
 to the connection scope.
 """
+import hashlib
 import logging
-from channels.db import database_sync_to_async
+import time
+from urllib.parse import parse_qs, unquote
 from channels.middleware import BaseMiddleware
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from base.models import MyUser
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on how long a verified token is trusted without re-decoding it
+TOKEN_CACHE_TTL = 30
 
-@database_sync_to_async
-def get_user_from_token(token_key):
+# How long a resolved WebSocket user is reused across connects (seconds)
+USER_CACHE_TTL = 60
+
+
+def token_cache_key(token_key):
+    """Cache key for a verified token; the raw JWT never ends up in the cache."""
+    return f'wsjwt:{hashlib.sha256(token_key.encode()).hexdigest()[:32]}'
+
+
+def user_cache_key(user_id):
+    """Cache key for the (username, is_active) of a WebSocket user."""
+    return f'wsuser:{user_id}'
+
+
+async def get_user_from_token(token_key):
     """
     Validate JWT token and return the associated user.
-    
+
+    The user_id of a verified token is cached for at most TOKEN_CACHE_TTL
+    seconds (never past the token's own expiry), so reconnects with the same
+    token skip signature verification. The resolved user is cached for
+    USER_CACHE_TTL seconds as well (dropped on logout), so reconnects skip
+    the user query too.
+
     Args:
         token_key: The JWT access token string
-        
+
     Returns:
         MyUser instance if valid, AnonymousUser otherwise
     """
+    key = token_cache_key(token_key)
     try:
-        # Decode and validate the token
-        access_token = AccessToken(token_key)
-        
-        # Get user ID from token (configured as 'username' in SIMPLE_JWT settings)
-        user_id = access_token.get('user_id')
-        logger.debug(f"Token decoded, user_id from token: {user_id}")
-        
-        if user_id:
-            user = MyUser.objects.get(username=user_id)
-            logger.debug(f"User found: {user.username}")
-            return user
-        return AnonymousUser()
-        
+        user_id = await cache.aget(key)
+        if user_id is None:
+            # Decode and validate the token
+            access_token = AccessToken(token_key)
+
+            # Get user ID from token (configured as 'username' in SIMPLE_JWT settings)
+            user_id = access_token.get('user_id')
+            logger.debug(f"Token decoded, user_id from token: {user_id}")
+            if not user_id:
+                return AnonymousUser()
+
+            ttl = min(TOKEN_CACHE_TTL, access_token['exp'] - int(time.time()))
+            if ttl > 0:
+                await cache.aset(key, user_id, ttl)
+
+        cached = await cache.aget(user_cache_key(user_id))
+        if cached is not None:
+            # Consumers only need the username/pk, so an unsaved instance
+            # stands in for the row on reconnects
+            username, is_active = cached
+            return MyUser(username=username, is_active=is_active)
+
+        user = await MyUser.objects.aget(username=user_id)
+        logger.debug(f"User found: {user.username}")
+        await cache.aset(user_cache_key(user_id), (user.username, user.is_active), USER_CACHE_TTL)
+        return user
+
     except (InvalidToken, TokenError, MyUser.DoesNotExist) as e:
         logger.warning(f"Token validation failed: {e}")
         return AnonymousUser()
@@ -63,10 +102,8 @@ class JWTAuthMiddleware(BaseMiddleware):
         scope['user'] = AnonymousUser()
         
         # Try to get token from cookies first (set by frontend auth)
-        cookies = self._parse_cookies(scope.get('headers', []))
-        token = cookies.get('access_token')  # Match frontend cookie name
-        
-        logger.debug(f"WebSocket connection - Cookies found: {list(cookies.keys())}")
+        token = self._get_cookie(scope.get('headers', []), 'access_token')  # Match frontend cookie name
+
         logger.debug(f"Access token from cookie: {'Found' if token else 'Not found'}")
         
         # Fallback to query parameter if no cookie
@@ -84,27 +121,42 @@ class JWTAuthMiddleware(BaseMiddleware):
         
         return await super().__call__(scope, receive, send)
     
-    def _parse_cookies(self, headers):
+    def _get_cookie(self, headers, name):
         """
-        Parse cookies from WebSocket headers.
-        
+        Find a single cookie in the WebSocket headers.
+
+        Walks the raw Cookie header bytes one cookie at a time and stops at
+        the first ``name=``, instead of decoding and splitting every cookie.
+
         Args:
             headers: List of header tuples from scope
-            
+            name: Cookie name to look for
+
         Returns:
-            Dictionary of cookie name -> value
+            Cookie value string or None
         """
-        cookies = {}
+        prefix = name.encode('ascii') + b'='
         for header_name, header_value in headers:
-            if header_name == b'cookie':
-                cookie_string = header_value.decode('utf-8')
-                for item in cookie_string.split(';'):
-                    item = item.strip()
-                    if '=' in item:
-                        key, value = item.split('=', 1)
-                        cookies[key.strip()] = value.strip()
-        return cookies
-    
+            if header_name != b'cookie':
+                continue
+            start = 0
+            while start < len(header_value):
+                # A cookie starts at offset 0 or after "; " - a match anywhere
+                # else (e.g. inside another cookie's value) doesn't count
+                while header_value.startswith(b' ', start):
+                    start += 1
+                end = header_value.find(b';', start)
+                if end == -1:
+                    end = len(header_value)
+                if header_value.startswith(prefix, start):
+                    # Cookies are ASCII (RFC 6265), so only the value is decoded
+                    try:
+                        return header_value[start + len(prefix):end].strip().decode('ascii') or None
+                    except UnicodeDecodeError:
+                        return None
+                start = end + 1
+        return None
+
     def _get_token_from_query(self, scope):
         """
         Extract token from query string parameters.
@@ -115,9 +167,23 @@ class JWTAuthMiddleware(BaseMiddleware):
         Returns:
             Token string or None
         """
-        query_string = scope.get('query_string', b'').decode('utf-8')
-        params = dict(
-            item.split('=') for item in query_string.split('&') 
-            if '=' in item
-        )
-        return params.get('token')
+        query_string = scope.get('query_string', b'')
+        start = query_string.find(b'token=')
+        while start != -1:
+            # Only a match at the start of a parameter counts (not e.g. "xtoken=")
+            if start == 0 or query_string[start - 1:start] == b'&':
+                start += len(b'token=')
+                end = query_string.find(b'&', start)
+                if end == -1:
+                    end = len(query_string)
+                return unquote(query_string[start:end].decode('latin-1')) or None
+            start = query_string.find(b'token=', start + 1)
+        
+        # The parameter name itself may be percent-encoded
+        if b'%' in query_string:
+            try:
+                params = parse_qs(query_string.decode('latin-1'), max_num_fields=8)
+            except ValueError:
+                return None
+            return params.get('token', [None])[0]
+        return None
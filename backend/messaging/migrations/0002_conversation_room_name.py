@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-15 10:31
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0001_initial'),
+    ]
+
+    # The database computes the column for every existing row as well,
+    # so no data migration is needed.
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='room_name',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Concat('participant_1', models.Value('_'), 'participant_2'), output_field=models.CharField(max_length=101)),
+        ),
+    ]
@@ -6,7 +6,9 @@ chat history between users.
 """
 import uuid
 from django.db import models
-from django.db.models import Q
+from django.db.models import Q, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
 from base.models import MyUser
 
 
@@ -48,9 +50,12 @@ class ConversationManager(models.Manager):
         Returns:
             QuerySet of conversations involving this user
         """
-        return self.filter(
-            Q(participant_1=user) | Q(participant_2=user)
-        )
+        # UNION ALL of two single-column index lookups instead of an OR
+        # across both columns; wrapped in pk__in so the result can still
+        # be annotated and filtered like any other queryset
+        as_p1 = self.filter(participant_1=user).order_by().values('pk')
+        as_p2 = self.filter(participant_2=user).order_by().values('pk')
+        return self.filter(pk__in=as_p1.union(as_p2, all=True))
 
 
 class Conversation(models.Model):
@@ -71,6 +76,16 @@ class Conversation(models.Model):
         on_delete=models.CASCADE,
         related_name='conversations_as_p2'
     )
+    # "<participant_1>_<participant_2>", computed and stored by the database
+    # (participant ids are the usernames) so it can be looked up by index.
+    # Not unique: usernames may contain '_', so two pairs can share a name;
+    # unique_conversation is what keeps one row per pair.
+    room_name = models.GeneratedField(
+        expression=Concat('participant_1', Value('_'), 'participant_2'),
+        output_field=models.CharField(max_length=101),
+        db_persist=True,
+        db_index=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -95,7 +110,7 @@ class Conversation(models.Model):
     
     def get_other_participant(self, user):
         """Return the other participant in the conversation."""
-        if self.participant_1 == user:
+        if self.participant_1_id == user.pk:
             return self.participant_2
         return self.participant_1
     
@@ -105,7 +120,11 @@ class Conversation(models.Model):
         
         Format: username1_username2 (alphabetically sorted)
         """
-        return f"{self.participant_1.username}_{self.participant_2.username}"
+        if 'room_name' in self.get_deferred_fields():
+            # Not loaded yet (e.g. just created); the same value the
+            # database computes, without a refresh query
+            return f"{self.participant_1_id}_{self.participant_2_id}"
+        return self.room_name
     
     def get_unread_count(self, user):
         """Get count of unread messages for a user in this conversation."""
@@ -139,16 +158,40 @@ class Message(models.Model):
         indexes = [
             models.Index(fields=['conversation', 'created_at']),
             models.Index(fields=['sender', 'created_at']),
-            models.Index(fields=['conversation', 'is_read']),
+            # Only unread messages are ever looked up by read state, so a
+            # partial index stays small as conversations get read
+            models.Index(
+                fields=['conversation', 'sender'],
+                condition=Q(is_read=False),
+                include=['created_at'],
+                name='msg_unread_partial',
+            ),
         ]
     
     def __str__(self):
         return f"Message from {self.sender} at {self.created_at}"
     
-    def mark_as_read(self):
-        """Mark this message as read."""
-        if not self.is_read:
-            from django.utils import timezone
-            self.is_read = True
-            self.read_at = timezone.now()
-            self.save(update_fields=['is_read', 'read_at'])
+    @classmethod
+    def mark_read(cls, messages, user):
+        """
+        Mark the messages user received as read, in a single UPDATE.
+        
+        Args:
+            messages: QuerySet of messages, or an iterable of message ids
+            user: The reader; messages they sent themselves are skipped
+            
+        Returns:
+            Number of messages marked as read
+        """
+        return cls._unread_for(messages, user).update(is_read=True, read_at=timezone.now())
+    
+    @classmethod
+    async def amark_read(cls, messages, user):
+        """Async version of mark_read, for the WebSocket consumer."""
+        return await cls._unread_for(messages, user).aupdate(is_read=True, read_at=timezone.now())
+    
+    @classmethod
+    def _unread_for(cls, messages, user):
+        if not isinstance(messages, models.QuerySet):
+            messages = cls.objects.filter(pk__in=messages)
+        return messages.filter(is_read=False).exclude(sender=user)
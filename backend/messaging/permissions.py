@@ -1,7 +1,12 @@
 """
 Custom permissions for the messaging system.
 """
+from django.core.cache import cache
 from rest_framework.permissions import BasePermission
+from base.models import MyUser
+
+# How long a mutual follow check stays cached (seconds)
+MUTUAL_FOLLOW_TTL = 60
 
 
 class IsMutualFollow(BasePermission):
@@ -43,10 +48,28 @@ class IsMutualFollow(BasePermission):
         return True
 
 
+def mutual_follow_queryset(user1_pk, user2_pk):
+    """
+    Queryset that is non-empty only if the two users follow each other.
+    
+    Joins the followers table twice in a single query:
+    user1 follows user2: user2 is in user1's following
+    user2 follows user1: user2 is in user1's followers
+    """
+    return MyUser.objects.filter(
+        pk=user1_pk,
+        following__pk=user2_pk,
+        followers__pk=user2_pk,
+    )
+
+
 def check_mutual_follow(user1, user2):
     """
     Check if two users have a mutual follow relationship.
     
+    The result is cached per pair for MUTUAL_FOLLOW_TTL seconds and
+    dropped by invalidate_mutual_follow when either side (un)follows.
+    
     Args:
         user1: First MyUser instance
         user2: Second MyUser instance
@@ -57,12 +80,52 @@ def check_mutual_follow(user1, user2):
     if user1 == user2:
         return False
     
-    # user1 follows user2: user2 is in user1's following
-    # user2 follows user1: user1 is in user2's following
-    user1_follows_user2 = user2.followers.filter(username=user1.username).exists()
-    user2_follows_user1 = user1.followers.filter(username=user2.username).exists()
+    key = mutual_follow_cache_key(user1.pk, user2.pk)
+    mutual = cache.get(key)
+    if mutual is None:
+        mutual = mutual_follow_queryset(user1.pk, user2.pk).exists()
+        cache.set(key, mutual, MUTUAL_FOLLOW_TTL)
+    return mutual
+
+
+def cached_check_mutual_follow(holder, user1, user2):
+    """
+    check_mutual_follow memoized on holder (e.g. the current request).
+    
+    Repeated checks for the same pair of users within one request only
+    hit the database once.
+    
+    Args:
+        holder: Object the cache is attached to
+        user1: First MyUser instance
+        user2: Second MyUser instance
+        
+    Returns:
+        bool: True if both users follow each other, False otherwise
+    """
+    memo = getattr(holder, '_mutual_follow_cache', None)
+    if memo is None:
+        memo = {}
+        holder._mutual_follow_cache = memo
+    
+    key = frozenset((user1.pk, user2.pk))
+    if key not in memo:
+        memo[key] = check_mutual_follow(user1, user2)
+    return memo[key]
+
+
+def mutual_follow_cache_key(user1_pk, user2_pk):
+    """Cache key for whether two users follow each other (order-independent)."""
+    return 'mutual:{}:{}'.format(*sorted((user1_pk, user2_pk)))
+
+
+def invalidate_mutual_follow(user1, user2):
+    """
+    Drop the cached mutual follow check between two users.
     
-    return user1_follows_user2 and user2_follows_user1
+    Called whenever the follow relationship between them changes.
+    """
+    cache.delete(mutual_follow_cache_key(user1.pk, user2.pk))
 
 
 def can_message_user(from_user, to_user):
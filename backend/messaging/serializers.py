@@ -7,6 +7,19 @@ from .models import Conversation, Message
 from base.models import MyUser
 
 
+def context_user_id(context):
+    """
+    The current user's pk: context['user_id'] when the view provides it,
+    otherwise taken from the request.
+    """
+    user_id = context.get('user_id')
+    if user_id is None:
+        request = context.get('request')
+        if request and request.user:
+            user_id = request.user.pk
+    return user_id
+
+
 class MessageUserSerializer(serializers.ModelSerializer):
     """Minimal user serializer for message context."""
     
@@ -18,8 +31,8 @@ class MessageUserSerializer(serializers.ModelSerializer):
 class MessageSerializer(serializers.ModelSerializer):
     """Serializer for individual messages."""
     
-    sender_username = serializers.CharField(source='sender.username', read_only=True)
-    sender_profile_image = serializers.ImageField(source='sender.profile_image', read_only=True)
+    sender_username = serializers.SerializerMethodField()
+    sender_profile_image = serializers.SerializerMethodField()
     formatted_time = serializers.SerializerMethodField()
     is_own_message = serializers.SerializerMethodField()
     
@@ -38,9 +51,32 @@ class MessageSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'is_read', 'read_at']
     
+    def get_sender_username(self, obj):
+        return self._sender_data(obj)['username']
+    
+    def get_sender_profile_image(self, obj):
+        return self._sender_data(obj)['profile_image']
+    
+    def _sender_data(self, obj):
+        """
+        Serialized sender, built once per sender for the whole response.
+        
+        A conversation only has two senders, so the map in the context
+        saves loading and serializing the same user for every message.
+        """
+        senders = self.context.setdefault('senders', {})
+        data = senders.get(obj.sender_id)
+        if data is None:
+            if Message.sender.is_cached(obj):
+                sender = obj.sender
+            else:
+                sender = MyUser.objects.only(*MessageUserSerializer.Meta.fields).get(pk=obj.sender_id)
+            data = senders[obj.sender_id] = MessageUserSerializer(sender, context=self.context).data
+        return data
+    
     def get_formatted_time(self, obj):
         """Return human-readable time format."""
-        now = timezone.now()
+        now = self.context.get('now') or timezone.now()
         diff = now - obj.created_at
         
         if diff.days == 0:
@@ -54,10 +90,9 @@ class MessageSerializer(serializers.ModelSerializer):
     
     def get_is_own_message(self, obj):
         """Check if the message was sent by the current user."""
-        request = self.context.get('request')
-        if request and request.user:
-            return obj.sender == request.user
-        return False
+        user_id = context_user_id(self.context)
+        # Compare keys so the sender row never needs to be loaded
+        return user_id is not None and obj.sender_id == user_id
 
 
 class ConversationSerializer(serializers.ModelSerializer):
@@ -81,26 +116,47 @@ class ConversationSerializer(serializers.ModelSerializer):
     
     def get_other_user(self, obj):
         """Get the other participant in the conversation."""
-        request = self.context.get('request')
-        if request and request.user:
-            other = obj.get_other_participant(request.user)
-            return MessageUserSerializer(other, context=self.context).data
-        return None
+        user_id = context_user_id(self.context)
+        if user_id is None:
+            return None
+        other = obj.participant_2 if obj.participant_1_id == user_id else obj.participant_1
+        return MessageUserSerializer(other, context=self.context).data
     
     def get_last_message(self, obj):
         """Get the most recent message in the conversation."""
+        if hasattr(obj, 'last_message_created_at'):
+            # Annotated by the list view
+            if obj.last_message_created_at is None:
+                return None
+            return self._format_last_message(
+                obj.last_message_content,
+                obj.last_message_sender,
+                obj.last_message_created_at,
+                obj.last_message_is_read,
+            )
         last_msg = obj.messages.order_by('-created_at').first()
         if last_msg:
-            return {
-                'content': last_msg.content[:50] + ('...' if len(last_msg.content) > 50 else ''),
-                'sender_username': last_msg.sender.username,
-                'created_at': last_msg.created_at,
-                'is_read': last_msg.is_read,
-            }
+            return self._format_last_message(
+                last_msg.content,
+                last_msg.sender_id,
+                last_msg.created_at,
+                last_msg.is_read,
+            )
         return None
     
+    def _format_last_message(self, content, sender_username, created_at, is_read):
+        return {
+            'content': content[:50] + ('...' if len(content) > 50 else ''),
+            'sender_username': sender_username,
+            'created_at': created_at,
+            'is_read': is_read,
+        }
+    
     def get_unread_count(self, obj):
         """Get count of unread messages for current user."""
+        if hasattr(obj, 'unread_count'):
+            # Annotated by the list view
+            return obj.unread_count
         request = self.context.get('request')
         if request and request.user:
             return obj.get_unread_count(request.user)
@@ -121,7 +177,9 @@ class ConversationDetailSerializer(ConversationSerializer):
     
     def get_recent_messages(self, obj):
         """Get the 20 most recent messages."""
-        messages = obj.messages.order_by('-created_at')[:20]
+        messages = getattr(obj, 'latest_messages', None)
+        if messages is None:
+            messages = obj.messages.select_related('sender').order_by('-created_at')[:20]
         # Reverse to get chronological order
         messages = list(reversed(messages))
         return MessageSerializer(messages, many=True, context=self.context).data
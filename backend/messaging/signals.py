@@ -0,0 +1,15 @@
+"""
+Signal handlers for the messaging system.
+"""
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.dispatch import receiver
+
+from .middleware import user_cache_key
+
+
+@receiver(user_logged_out)
+def drop_cached_websocket_user(sender, user, **kwargs):
+    """Forget the cached WebSocket user so the next connect reloads it."""
+    if user is not None:
+        cache.delete(user_cache_key(user.pk))
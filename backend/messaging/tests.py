@@ -1,3 +1,35 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from .middleware import JWTAuthMiddleware
+
+
+class GetCookieTests(SimpleTestCase):
+    """Tests for JWTAuthMiddleware._get_cookie."""
+
+    def get(self, cookie_header):
+        headers = [(b'host', b'example.com')]
+        if cookie_header is not None:
+            headers.append((b'cookie', cookie_header))
+        return JWTAuthMiddleware(None)._get_cookie(headers, 'access_token')
+
+    def test_only_cookie(self):
+        self.assertEqual(self.get(b'access_token=abc'), 'abc')
+
+    def test_cookie_between_others(self):
+        self.assertEqual(self.get(b'foo=1; access_token=abc; x=y'), 'abc')
+
+    def test_no_space_after_separator(self):
+        self.assertEqual(self.get(b'foo=1;access_token=abc'), 'abc')
+
+    def test_name_suffix_does_not_match(self):
+        self.assertIsNone(self.get(b'xaccess_token=abc'))
+        self.assertEqual(self.get(b'xaccess_token=no; access_token=abc'), 'abc')
+
+    def test_name_inside_other_value_does_not_match(self):
+        self.assertEqual(self.get(b'pref="x access_token=evil"; access_token=real'), 'real')
+        self.assertIsNone(self.get(b'pref="x access_token=evil"'))
+
+    def test_missing(self):
+        self.assertIsNone(self.get(b'foo=1; bar=2'))
+        self.assertIsNone(self.get(b'access_token='))
+        self.assertIsNone(self.get(None))
@@ -6,8 +6,10 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery
 
 from .models import Conversation, Message
 from .serializers import (
@@ -20,6 +22,53 @@ from .permissions import can_message_user
 from base.models import MyUser
 
 
+def annotate_conversations(conversations, user):
+    """
+    Attach the list view's per-row data (participants, unread_count and the
+    last message's fields) so ConversationSerializer doesn't need to run
+    queries per conversation.
+    """
+    last_message = Message.objects.filter(
+        conversation=OuterRef('pk')
+    ).order_by('-created_at')
+    return conversations.select_related('participant_1', 'participant_2').annotate(
+        unread_count=Count(
+            'messages',
+            filter=Q(messages__is_read=False) & ~Q(messages__sender=user),
+        ),
+        last_message_content=Subquery(last_message.values('content')[:1]),
+        last_message_sender=Subquery(last_message.values('sender_id')[:1]),
+        last_message_created_at=Subquery(last_message.values('created_at')[:1]),
+        last_message_is_read=Subquery(last_message.values('is_read')[:1]),
+    )
+
+
+def prefetch_recent_messages(conversations):
+    """
+    Prefetch each conversation's 20 latest messages (with senders) into
+    latest_messages for ConversationDetailSerializer, in one query for
+    the whole queryset.
+    """
+    return conversations.select_related('participant_1', 'participant_2').prefetch_related(
+        Prefetch(
+            'messages',
+            queryset=Message.objects.select_related('sender').order_by('-created_at')[:20],
+            to_attr='latest_messages',
+        )
+    )
+
+
+def message_context(request):
+    """
+    Serializer context for responses that include messages.
+    
+    'now' is taken once so MessageSerializer doesn't call timezone.now()
+    for every message it formats, and 'user_id' spares it a request.user
+    lookup per message.
+    """
+    return {'request': request, 'now': timezone.now(), 'user_id': request.user.pk}
+
+
 class ConversationListView(APIView):
     """
     GET /api/conversations/
@@ -30,11 +79,14 @@ class ConversationListView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        conversations = Conversation.objects.for_user(request.user)
+        conversations = annotate_conversations(
+            Conversation.objects.for_user(request.user),
+            request.user
+        )
         serializer = ConversationSerializer(
             conversations,
             many=True,
-            context={'request': request}
+            context={'request': request, 'user_id': request.user.pk}
         )
         return Response(serializer.data)
 
@@ -49,15 +101,15 @@ class ConversationDetailView(APIView):
     
     def get(self, request, conversation_id):
         conversation = get_object_or_404(
-            Conversation.objects.filter(
+            prefetch_recent_messages(Conversation.objects.filter(
                 Q(participant_1=request.user) | Q(participant_2=request.user)
-            ),
+            )),
             id=conversation_id
         )
         
         serializer = ConversationDetailSerializer(
             conversation,
-            context={'request': request}
+            context=message_context(request)
         )
         return Response(serializer.data)
 
@@ -86,28 +138,29 @@ class ConversationMessagesView(APIView):
         before = request.query_params.get('before')
         if before:
             try:
-                from datetime import datetime
-                before_dt = datetime.fromisoformat(before.replace('Z', '+00:00'))
+                before_dt = parse_datetime(before)
+            except ValueError:
+                # Well formatted but not a real date/time, e.g. month 13
+                before_dt = None
+            if before_dt is not None:
                 messages = messages.filter(created_at__lt=before_dt)
-            except (ValueError, TypeError):
-                pass
         
-        # Get latest 50 messages (for infinite scroll, older messages first)
-        messages = messages.order_by('-created_at')[:50]
+        # Get latest 50 messages (for infinite scroll, older messages first).
+        # One extra row is fetched to tell whether older messages remain.
+        fetched = list(messages.order_by('-created_at')[:51])
+        has_more = len(fetched) > 50
         # Reverse to chronological order
-        messages = list(reversed(messages))
+        messages = list(reversed(fetched[:50]))
         
         serializer = MessageSerializer(
             messages,
             many=True,
-            context={'request': request}
+            context=message_context(request)
         )
         
         return Response({
             'messages': serializer.data,
-            'has_more': conversation.messages.filter(
-                created_at__lt=messages[0].created_at if messages else timezone.now()
-            ).exists() if messages else False
+            'has_more': has_more
         })
 
 
@@ -152,26 +205,27 @@ class SendMessageView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Get or create conversation
-        conversation, created = Conversation.objects.get_or_create_between(
-            request.user,
-            receiver
-        )
-        
-        # Create message
-        message = Message.objects.create(
-            conversation=conversation,
-            sender=request.user,
-            content=content
-        )
-        
-        # Update conversation timestamp
-        conversation.save()  # This updates updated_at
-        
+        with transaction.atomic():
+            # Get or create conversation
+            conversation, created = Conversation.objects.get_or_create_between(
+                request.user,
+                receiver
+            )
+
+            # Create message
+            message = Message.objects.create(
+                conversation=conversation,
+                sender=request.user,
+                content=content
+            )
+
+            # Bump the conversation timestamp without rewriting the whole row
+            Conversation.objects.filter(pk=conversation.pk).update(updated_at=timezone.now())
+
         # Return the created message
         message_serializer = MessageSerializer(
             message,
-            context={'request': request}
+            context=message_context(request)
         )
         
         return Response({
@@ -199,14 +253,7 @@ class MarkMessagesReadView(APIView):
         )
         
         # Mark unread messages from other user as read
-        updated_count = conversation.messages.filter(
-            is_read=False
-        ).exclude(
-            sender=request.user
-        ).update(
-            is_read=True,
-            read_at=timezone.now()
-        )
+        updated_count = Message.mark_read(conversation.messages.all(), request.user)
         
         return Response({
             'marked_read': updated_count
@@ -260,7 +307,7 @@ class StartConversationView(APIView):
         
         serializer = ConversationDetailSerializer(
             conversation,
-            context={'request': request}
+            context=message_context(request)
         )
         
         return Response({
@@ -278,9 +325,11 @@ class UnreadCountView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        conversations = Conversation.objects.for_user(request.user)
-        total_unread = sum(c.get_unread_count(request.user) for c in conversations)
-        
+        total_unread = Message.objects.filter(
+            Q(conversation__participant_1=request.user) | Q(conversation__participant_2=request.user),
+            is_read=False
+        ).exclude(sender=request.user).count()
+
         return Response({
             'unread_count': total_unread
         })
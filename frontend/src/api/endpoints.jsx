@@ -91,8 +91,12 @@ export const create_post = async (description) => {
   return response.data;
 };
 
-export const get_posts = async (num) => {
-  const response = await api.get(`/all_posts/?page=${num}`);
+export const get_posts = async (cursor = null) => {
+  let url = "/all_posts/";
+  if (cursor) {
+    url += `?cursor=${encodeURIComponent(cursor)}`;
+  }
+  const response = await api.get(url);
   return response.data;
 };
 
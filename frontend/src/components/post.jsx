@@ -4,6 +4,13 @@ import { FaHeart, FaRegHeart } from "react-icons/fa";
 import { toggleLike } from "../api/endpoints";
 import { Card, IconButton } from "./ui";
 
+// formatted_date is an ISO timestamp; format it in the viewer's locale
+const dateFormatter = new Intl.DateTimeFormat([], {
+  day: "2-digit",
+  month: "short",
+  year: "2-digit",
+});
+
 const Post = ({
   id,
   username,
@@ -71,7 +78,9 @@ const Post = ({
             {clientLikeCount}
           </span>
         </div>
-        <span className="text-sm text-secondary-500">{formatted_date}</span>
+        <span className="text-sm text-secondary-500">
+          {dateFormatter.format(new Date(formatted_date))}
+        </span>
       </div>
     </Card>
   );
@@ -8,16 +8,18 @@ const Home = () => {
   const [posts, setPosts] = useState([]);
   const [loading, setLoading] = useState(true);
   const [loadingMore, setLoadingMore] = useState(false);
-  const [nextPage, setNextPage] = useState(1);
+  const [nextCursor, setNextCursor] = useState(null);
 
   const fetchData = async (isLoadMore = false) => {
     if (isLoadMore) {
       setLoadingMore(true);
     }
     try {
-      const data = await get_posts(nextPage);
+      const data = await get_posts(isLoadMore ? nextCursor : null);
       setPosts(isLoadMore ? [...posts, ...data.results] : data.results);
-      setNextPage(data.next ? nextPage + 1 : null);
+      setNextCursor(
+        data.next ? new URL(data.next).searchParams.get("cursor") : null,
+      );
     } catch {
       console.error("Error getting posts");
     } finally {
@@ -31,7 +33,7 @@ const Home = () => {
   }, []);
 
   const loadMorePosts = () => {
-    if (nextPage) {
+    if (nextCursor) {
       fetchData(true);
     }
   };
@@ -64,7 +66,7 @@ const Home = () => {
             ))}
 
             {/* Load More Button */}
-            {nextPage && (
+            {nextCursor && (
               <Button
                 variant="secondary"
                 onClick={loadMorePosts}